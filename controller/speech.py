@@ -1,21 +1,44 @@
 import sys
 import os
 import time
+import functools
+from dataclasses import dataclass
 from datetime import datetime
-from processor.speech_recognizer import VoskSpeechRecognizer
 
 # --- Configuration ---
-# All configuration and environment variable loading is now handled in main.py
-MODEL_DIR = os.getenv("VOSK_MODEL_PATH")
+# Environment variables are loaded from .env in main.py and read once by _load_config().
 LOG_FILE = "logs/speech_log.txt"
 
-# --- Advanced Recognizer Settings from .env ---
-# Fallback to default values if not set in .env
-SAMPLE_RATE = int(os.getenv("RECOGNIZER_SAMPLE_RATE", 16000))
-NOISE_CALIBRATION = float(os.getenv("NOISE_CALIBRATION_DURATION", 2.0))
-VAD_AGGRESSIVENESS = int(os.getenv("VAD_AGGRESSIVENESS", 1))
-SILENCE_THRESHOLD = float(os.getenv("SILENCE_THRESHOLD", 2.5))
-PHRASE_TIMEOUT = float(os.getenv("PHRASE_TIMEOUT", 15.0))
+
+@dataclass(frozen=True)
+class SpeechConfig:
+    """Recognizer settings parsed from the environment."""
+    model_dir: str | None
+    sample_rate: int
+    noise_calibration: float
+    vad_aggressiveness: int
+    silence_threshold: float
+    phrase_timeout: float
+    audio_buffer_frames: int
+    use_gpu: bool
+
+
+@functools.lru_cache(maxsize=1)
+def _load_config():
+    """
+    Reads the recognizer settings from the environment, falling back to default
+    values if not set in .env. The result is cached, so this only runs once.
+    """
+    return SpeechConfig(
+        model_dir=os.getenv("VOSK_MODEL_PATH"),
+        sample_rate=int(os.getenv("RECOGNIZER_SAMPLE_RATE", 16000)),
+        noise_calibration=float(os.getenv("NOISE_CALIBRATION_DURATION", 2.0)),
+        vad_aggressiveness=int(os.getenv("VAD_AGGRESSIVENESS", 1)),
+        silence_threshold=float(os.getenv("SILENCE_THRESHOLD", 2.5)),
+        phrase_timeout=float(os.getenv("PHRASE_TIMEOUT", 15.0)),
+        audio_buffer_frames=int(os.getenv("AUDIO_BUFFER_FRAMES", 100)),
+        use_gpu=os.getenv("VOSK_USE_GPU", "false").lower() == "true",
+    )
 
 
 class StatusLogger:
@@ -65,54 +88,67 @@ def start_listening():
     This is the main application loop. It initializes the speech recognizer 
     and processes the transcription output.
     """
-    if not MODEL_DIR:
+    config = _load_config()
+    if not config.model_dir:
         print("[ERROR] VOSK_MODEL_PATH is not set in the .env file.", file=sys.stderr)
         sys.exit(1)
 
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
+    # Imported here so that vosk, sounddevice (PortAudio) and webrtcvad are only
+    # loaded once the configuration is known to be usable.
+    from processor.speech_recognizer import VoskSpeechRecognizer
+
     try:
         # Use the updated settings from the .env file
         recognizer = VoskSpeechRecognizer(
-            model_path=MODEL_DIR,
-            samplerate=SAMPLE_RATE,
-            vad_aggressiveness=VAD_AGGRESSIVENESS
+            model_path=config.model_dir,
+            samplerate=config.sample_rate,
+            vad_aggressiveness=config.vad_aggressiveness,
+            buffer_size=config.audio_buffer_frames,
+            use_gpu=config.use_gpu
         )
         
-        print(f"[INFO] Speech recognizer initialized with model: {MODEL_DIR}")
-        print(f"[INFO] VAD Aggressiveness: {VAD_AGGRESSIVENESS}, Silence Threshold: {SILENCE_THRESHOLD}s, Phrase Timeout: {PHRASE_TIMEOUT}s")
+        print(f"[INFO] Speech recognizer initialized with model: {config.model_dir}")
+        if config.use_gpu:
+            print("[INFO] GPU inference requested (only used by GPU-enabled Vosk builds).")
+        print(f"[INFO] VAD Aggressiveness: {config.vad_aggressiveness}, Silence Threshold: {config.silence_threshold}s, Phrase Timeout: {config.phrase_timeout}s")
         print(f"[INFO] Logging complete statements to '{LOG_FILE}'")
         print("[INFO] Press Ctrl+C to stop.")
 
         status_logger = StatusLogger()
         
         transcription_generator = recognizer.listen_and_transcribe(
-            silence_threshold=SILENCE_THRESHOLD,
-            phrase_timeout=PHRASE_TIMEOUT,
-            calibration_duration=NOISE_CALIBRATION
+            silence_threshold=config.silence_threshold,
+            phrase_timeout=config.phrase_timeout,
+            calibration_duration=config.noise_calibration
         )
         
         status_logger.show_ready()
 
-        for result_type, text in transcription_generator:
-            if result_type == "partial":
-                status_logger.update(text)
-            elif result_type == "final" and text:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                log_message = f"[{timestamp}] Finalized: {text}"
-                
-                status_logger.finalize(log_message)
-                
-                with open(LOG_FILE, "a") as log_file:
+        # Open the log once for the whole session; line buffering flushes each entry.
+        with open(LOG_FILE, "a", buffering=1) as log_file:
+            for result_type, text in transcription_generator:
+                if result_type == "partial":
+                    status_logger.update(text)
+                elif result_type == "warning":
+                    status_logger.finalize(f"[WARNING] {text}")
+                    status_logger.show_ready()
+                elif result_type == "final" and text:
+                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    log_message = f"[{timestamp}] Finalized: {text}"
+                    
+                    status_logger.finalize(log_message)
+                    
                     log_file.write(log_message + "\n")
-                
-                # Show the listening status again for the next utterance
-                status_logger.show_ready()
+                    
+                    # Show the listening status again for the next utterance
+                    status_logger.show_ready()
 
     except KeyboardInterrupt:
         print("\n[INFO] Stopping listener...")
     except FileNotFoundError:
-        print(f"[ERROR] Model directory not found at '{MODEL_DIR}'.")
+        print(f"[ERROR] Model directory not found at '{config.model_dir}'.")
         print("[INFO] Please run the 'run.sh' script to download the required model.")
     except Exception as e:
         print(f"\n[ERROR] An unexpected error occurred: {e}", file=sys.stderr)
@@ -6,6 +6,7 @@ import sys
 import os
 import time
 import webrtcvad
+import numpy as np
 from collections import deque
 
 class VoskSpeechRecognizer:
@@ -14,7 +15,7 @@ class VoskSpeechRecognizer:
     through Voice Activity Detection (VAD) and configurable settings.
     """
 
-    def __init__(self, model_path, samplerate=16000, device=None, vad_aggressiveness=1):
+    def __init__(self, model_path, samplerate=16000, device=None, vad_aggressiveness=1, buffer_size=100, use_gpu=False):
         """
         Initializes the VoskSpeechRecognizer.
 
@@ -23,40 +24,111 @@ class VoskSpeechRecognizer:
             samplerate (int): The sample rate for the audio stream. Must match the model's training.
             device (int, optional): Input device ID. Defaults to the system's default device.
             vad_aggressiveness (int): VAD aggressiveness (0-3). 3 is most aggressive.
+            buffer_size (int): Number of VAD frames held in the capture ring buffer (at least 3).
+                Once all but two slots are pending, the oldest frame is dropped.
+            use_gpu (bool): Run acoustic model inference on CUDA. Requires a GPU-enabled Vosk build.
         """
+        if buffer_size < 3:
+            raise ValueError(f"buffer_size must be at least 3 frames, got {buffer_size}.")
+
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model path '{model_path}' not found. Please check the path.")
 
+        # GPU initialization must happen before the model is loaded.
+        if use_gpu:
+            vosk.GpuInit()
+
         self.model = vosk.Model(model_path)
         self.samplerate = samplerate
         self.device = device
-        self.q = queue.Queue()
+        # Bounded so a stalled recognizer cannot reference ring slots that are being
+        # overwritten: two slots stay free for the frame being written and the one being read.
+        self.q = queue.Queue(maxsize=buffer_size - 2)
+        self.dropped_frames = 0
         
         # Initialize VAD
         self.vad = webrtcvad.Vad()
         self.vad.set_mode(vad_aggressiveness)
 
+        # Frames quieter than this fraction of the calibrated ambient energy are treated
+        # as silence without consulting the VAD.
+        self.ambient_energy = 0.0
+        self.silence_energy_ratio = 0.5
+        # Squared form of (ambient_energy * silence_energy_ratio) scaled by the frame length,
+        # so frames can be gated on their sum of squares without a mean or sqrt.
+        self.energy_gate_sq = 0.0
+
         # VAD requires audio chunks of 10, 20, or 30 ms. We'll use 30ms.
         self.vad_frame_duration_ms = 30
         self.vad_frame_size = int(self.samplerate * self.vad_frame_duration_ms / 1000)
 
+        # Captured frames are written into one preallocated ring of fixed-size slots
+        # (int16 mono, so 2 bytes per sample). The queue only carries (offset, length)
+        # pairs, so no audio-sized buffer is allocated per frame on the PortAudio thread.
+        self.buffer_size = buffer_size
+        self.frame_bytes = self.vad_frame_size * 2
+        self._arena = bytearray(self.buffer_size * self.frame_bytes)
+        self._arena_view = memoryview(self._arena)
+        self._write_offset = 0
+
     def _audio_callback(self, indata, frames, time, status):
         """This is called (from a separate thread) for each audio block."""
         if status:
             print(status, file=sys.stderr)
-        self.q.put(bytes(indata))
+        offset = self._write_offset
+        length = len(indata)  # The stream's blocksize keeps this at one VAD frame
+        self._arena_view[offset:offset + length] = indata
+        self._write_offset = (offset + self.frame_bytes) % len(self._arena)
+        try:
+            self.q.put_nowait((offset, length))
+        except queue.Full:
+            # Recognition has fallen behind. The capture thread must never block,
+            # so discard the oldest pending frame to keep up with live audio.
+            try:
+                self.q.get_nowait()
+                self.dropped_frames += 1
+            except queue.Empty:
+                pass
+            self.q.put_nowait((offset, length))
+
+    def _read_frame(self, offset, length):
+        """Copies a captured frame out of the ring buffer on the consumer thread."""
+        return bytes(self._arena_view[offset:offset + length])
+
+    def _frame_sum_of_squares(self, frame):
+        """Returns the sum of squared samples of an int16 audio frame as a single dot product."""
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        return float(samples @ samples)
+
+    def _frame_energy(self, frame):
+        """Returns the RMS energy of an int16 audio frame."""
+        return (self._frame_sum_of_squares(frame) / (len(frame) // 2)) ** 0.5
+
+    def _is_speech(self, frame):
+        """
+        Checks a frame for speech, skipping the VAD entirely when the frame is far
+        below the ambient noise level measured during calibration.
+        """
+        if self.energy_gate_sq and self._frame_sum_of_squares(frame) < self.energy_gate_sq:
+            return False
+        return self.vad.is_speech(frame, self.samplerate)
 
     def _calibrate_noise(self, duration):
         """Listens for a short period to let the user and environment settle."""
         print(f"[INFO] Calibrating for ambient noise for {duration} seconds. Please be quiet.")
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            # Drain the queue of any initial noise
+        end_time = time.time() + duration
+        energies = []
+        while (remaining := end_time - time.time()) > 0:
+            # Drain the queue of any initial noise, sampling its energy as we go.
+            # Blocking until the next frame (or the deadline) avoids polling.
             try:
-                self.q.get_nowait()
+                offset, length = self.q.get(timeout=remaining)
+                energies.append(self._frame_energy(self._arena_view[offset:offset + length]))
             except queue.Empty:
                 pass
-            time.sleep(0.1)
+        if energies:
+            self.ambient_energy = sum(energies) / len(energies)
+            self.energy_gate_sq = (self.ambient_energy * self.silence_energy_ratio) ** 2 * self.vad_frame_size
         print("[INFO] Calibration complete. Ready to listen.")
 
 
@@ -72,7 +144,8 @@ class VoskSpeechRecognizer:
             calibration_duration (float): Seconds to listen for ambient noise at the start.
 
         Yields:
-            tuple: A tuple containing the result type ('partial' or 'final') and the transcribed text.
+            tuple: A tuple containing the result type ('partial', 'final' or 'warning') and the
+                transcribed text, or a warning message for 'warning'.
         """
         recognizer = vosk.KaldiRecognizer(self.model, self.samplerate)
         
@@ -83,15 +156,18 @@ class VoskSpeechRecognizer:
             self._calibrate_noise(calibration_duration)
 
             is_speaking = False
-            last_speech_time = time.time()
-            phrase_start_time = time.time()
+            # Endpointing deadlines, computed once per speech frame rather than
+            # re-deriving elapsed durations on every loop iteration.
+            silence_deadline = 0.0
+            phrase_deadline = 0.0
             
             while True:
                 try:
                     # Use a timeout to allow checking for silence even when no new audio comes in
-                    data = self.q.get(timeout=0.1)
+                    offset, length = self.q.get(timeout=0.1)
+                    data = self._read_frame(offset, length)
                     
-                    is_speech_in_frame = self.vad.is_speech(data, self.samplerate)
+                    is_speech_in_frame = self._is_speech(data)
 
                     # Process the audio frame
                     if recognizer.AcceptWaveform(data):
@@ -102,11 +178,12 @@ class VoskSpeechRecognizer:
                             yield "partial", partial_result['partial']
                     
                     if is_speech_in_frame:
+                        now = time.time()
                         if not is_speaking:
                             # Detected start of a new phrase
                             is_speaking = True
-                            phrase_start_time = time.time()
-                        last_speech_time = time.time()
+                            phrase_deadline = now + phrase_timeout
+                        silence_deadline = now + silence_threshold
 
                 except queue.Empty:
                     # No new audio. This is where we check if a phrase has ended.
@@ -117,18 +194,24 @@ class VoskSpeechRecognizer:
 
                 # Check for end-of-speech conditions ONLY if we have been speaking.
                 if is_speaking:
-                    time_since_last_speech = time.time() - last_speech_time
-                    phrase_duration = time.time() - phrase_start_time
+                    now = time.time()
                     
                     # FINALIZATION LOGIC:
                     # A phrase is considered final if EITHER:
-                    # 1. A period of silence is detected (time_since_last_speech > silence_threshold)
-                    # 2. The phrase has been going on for too long (phrase_duration > phrase_timeout)
-                    if time_since_last_speech > silence_threshold or phrase_duration > phrase_timeout:
+                    # 1. A period of silence is detected (silence_threshold has passed since the last speech)
+                    # 2. The phrase has been going on for too long (phrase_timeout has passed since it started)
+                    if now > silence_deadline or now > phrase_deadline:
                         # Use FinalResult() which gets the best possible transcription and resets the recognizer.
                         final_result_json = json.loads(recognizer.FinalResult())
                         final_text = final_result_json.get('text', '')
                         
+                        # The capture thread keeps counting while we report, so subtract
+                        # the snapshot instead of resetting to zero.
+                        dropped = self.dropped_frames
+                        if dropped:
+                            self.dropped_frames -= dropped
+                            yield "warning", f"Recognition fell behind; dropped {dropped} audio frames."
+                        
                         if final_text:
                             yield "final", final_text
                         